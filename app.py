@@ -1,31 +1,43 @@
 import os
-from flask import Flask, render_template, request, jsonify, send_from_directory
+import threading
+import time
+import orjson
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
 from werkzeug.utils import secure_filename
-from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
 
 from config import Config
 from utils.file_helper import (
-    allowed_file, validate_file_content, get_safe_filename,
-    cleanup_old_files, ensure_upload_folder_exists, get_file_size_mb
+    get_file_extension, validate_file_header, get_safe_filename,
+    cleanup_old_files, ensure_upload_folder_exists, get_file_size_mb,
+    save_upload, safe_unlink, MIME_SNIFF_BYTES
 )
 from utils.cups_helper import (
-    submit_print_job, get_print_queue, get_job_status,
+    submit_print_job, submit_print_jobs_bulk, get_print_queue, get_job_status,
     cancel_print_job, check_cups_available
 )
 from utils.db_helper import (
-    init_database, add_print_job, update_job_status,
-    get_recent_jobs, delete_old_records, get_job_by_id
+    init_database, add_print_job, add_print_jobs_bulk, update_job_status,
+    get_recent_jobs, get_jobs_by_ids, delete_old_records, get_job_by_id
 )
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Settings used by the request handlers, bound once at import
+UPLOAD_FOLDER = app.config['UPLOAD_FOLDER']
+ALLOWED_EXT = app.config['ALLOWED_EXTENSIONS']
+ALLOWED_EXT_DISPLAY = ', '.join(sorted(ALLOWED_EXT))
+RETENTION_DAYS = app.config['FILE_RETENTION_DAYS']
+MAX_UPLOAD_MB = app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024)
+HOSTNAME = app.config['HOSTNAME']
+APP_NAME = app.config['APP_NAME']
+
 # Initialize database
 init_database()
 
 # Ensure upload folder exists
-ensure_upload_folder_exists(app.config['UPLOAD_FOLDER'])
+ensure_upload_folder_exists(UPLOAD_FOLDER)
 
 
 def scheduled_cleanup():
@@ -33,38 +45,54 @@ def scheduled_cleanup():
     print(f"[{datetime.now()}] Running scheduled cleanup...")
 
     # Delete old files
-    deleted_files = cleanup_old_files(
-        app.config['UPLOAD_FOLDER'],
-        app.config['FILE_RETENTION_DAYS']
-    )
+    deleted_files = cleanup_old_files(UPLOAD_FOLDER, RETENTION_DAYS)
 
     # Delete old database records
-    deleted_records = delete_old_records(app.config['FILE_RETENTION_DAYS'])
+    deleted_records = delete_old_records(RETENTION_DAYS)
 
     print(f"Cleanup complete: {deleted_files} files, {deleted_records} records deleted")
 
 
-# Set up background scheduler for cleanup
-scheduler = BackgroundScheduler()
-scheduler.add_job(
-    scheduled_cleanup,
-    'interval',
-    hours=6,  # Run every 6 hours
-    id='cleanup_job'
-)
-scheduler.start()
+# Interval between cleanup runs (seconds)
+CLEANUP_INTERVAL = 6 * 60 * 60  # Run every 6 hours
+
+
+def _cleanup_loop():
+    """Run scheduled_cleanup every CLEANUP_INTERVAL seconds."""
+    while True:
+        time.sleep(CLEANUP_INTERVAL)
+        try:
+            scheduled_cleanup()
+        except Exception as e:
+            # Keep the loop alive if a single run fails
+            print(f"[{datetime.now()}] Scheduled cleanup failed: {e}")
+
+
+# Start background thread for cleanup
+threading.Thread(target=_cleanup_loop, name='cleanup', daemon=True).start()
+
+
+def _json(obj, status=200):
+    """Build a JSON response with orjson, for the frequently polled endpoints."""
+    return Response(orjson.dumps(obj), status=status, mimetype='application/json')
+
+
+# The page uses no per-request data, so render it once at startup
+# (url_for needs a request context to build the static URLs)
+with app.test_request_context('/print'):
+    _INDEX_HTML = render_template('index.html')
 
 
 @app.route('/')
 def index():
     """Redirect root to /print"""
-    return render_template('index.html')
+    return _INDEX_HTML
 
 
 @app.route('/print')
 def print_page():
     """Main print interface"""
-    return render_template('index.html')
+    return _INDEX_HTML
 
 
 @app.route('/api/upload', methods=['POST'])
@@ -109,33 +137,33 @@ def upload_files():
         }), 400
 
     results = []
+    saved_files = []  # (result index, original filename, safe name, filepath, size)
 
+    # First pass: validate and save every file
     for file in files:
         if file.filename == '':
             continue
 
         # Check if file type is allowed
-        if not allowed_file(file.filename):
+        extension = get_file_extension(file.filename)
+        if extension not in ALLOWED_EXT:
             results.append({
                 'filename': file.filename,
                 'success': False,
-                'error': f'File type not allowed. Allowed types: {", ".join(app.config["ALLOWED_EXTENSIONS"])}'
+                'error': f'File type not allowed. Allowed types: {ALLOWED_EXT_DISPLAY}'
             })
             continue
 
         # Generate safe filename
         original_filename = file.filename
         safe_name = get_safe_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], safe_name)
+        filepath = None
 
         try:
-            # Save file
-            file.save(filepath)
-
-            # Validate file content matches extension
-            extension = original_filename.rsplit('.', 1)[1].lower()
-            if not validate_file_content(filepath, extension):
-                os.remove(filepath)
+            # Validate file content matches extension before writing to disk
+            header = file.stream.read(MIME_SNIFF_BYTES)
+            file.stream.seek(0)
+            if not validate_file_header(header, extension):
                 results.append({
                     'filename': original_filename,
                     'success': False,
@@ -143,45 +171,21 @@ def upload_files():
                 })
                 continue
 
+            # Save file under a name no other file in the folder uses
+            filepath = save_upload(file, UPLOAD_FOLDER, safe_name)
+            safe_name = os.path.basename(filepath)
+
             # Get file size
             file_size_mb = get_file_size_mb(filepath)
 
-            # Submit print job
-            success, message = submit_print_job(filepath, copies, duplex)
-
-            if success:
-                job_id = message  # message contains job ID on success
-
-                # Add to database
-                add_print_job(
-                    job_id=job_id,
-                    filename=safe_name,
-                    original_filename=original_filename,
-                    filepath=filepath,
-                    file_size_mb=file_size_mb,
-                    copies=copies,
-                    duplex=duplex
-                )
-
-                results.append({
-                    'filename': original_filename,
-                    'success': True,
-                    'job_id': job_id,
-                    'message': f'Print job submitted (Job ID: {job_id})'
-                })
-            else:
-                # Remove file if print submission failed
-                os.remove(filepath)
-                results.append({
-                    'filename': original_filename,
-                    'success': False,
-                    'error': message
-                })
+            # Reserve a slot so results keep the upload order
+            saved_files.append((len(results), original_filename, safe_name, filepath, file_size_mb))
+            results.append(None)
 
         except Exception as e:
-            # Clean up file if it was saved
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            # Clean up file if this upload saved it
+            if filepath:
+                safe_unlink(filepath)
 
             results.append({
                 'filename': original_filename,
@@ -189,13 +193,58 @@ def upload_files():
                 'error': f'Error processing file: {str(e)}'
             })
 
+    # Second pass: submit all saved files to CUPS
+    submissions = submit_print_jobs_bulk(
+        [saved[3] for saved in saved_files], copies, duplex
+    )
+
+    pending_inserts = []
+    for saved, (filepath, success, message) in zip(saved_files, submissions):
+        index, original_filename, safe_name, _, file_size_mb = saved
+
+        if success:
+            job_id = message  # message contains job ID on success
+
+            # Queue for database insert
+            pending_inserts.append((
+                job_id, safe_name, original_filename, filepath,
+                file_size_mb, copies, duplex
+            ))
+
+            results[index] = {
+                'filename': original_filename,
+                'success': True,
+                'job_id': job_id,
+                'message': f'Print job submitted (Job ID: {job_id})'
+            }
+        else:
+            # Remove file if print submission failed
+            safe_unlink(filepath)
+            results[index] = {
+                'filename': original_filename,
+                'success': False,
+                'error': message
+            }
+
+    # Record all submitted jobs in one transaction
+    warning = None
+    try:
+        add_print_jobs_bulk(pending_inserts)
+    except Exception as e:
+        # Jobs are already queued in CUPS; report them but flag the history gap
+        warning = f'Print jobs were submitted but could not be recorded in history: {str(e)}'
+
     # Determine overall success
     overall_success = any(r['success'] for r in results)
 
-    return jsonify({
+    response = {
         'success': overall_success,
         'results': results
-    })
+    }
+    if warning:
+        response['warning'] = warning
+
+    return jsonify(response)
 
 
 @app.route('/api/queue', methods=['GET'])
@@ -205,67 +254,71 @@ def get_queue():
         # Get queue from CUPS
         cups_queue = get_print_queue()
 
-        # Get pending jobs from database for additional info
-        db_jobs = {job['job_id']: job for job in get_recent_jobs(1)}
+        # Look up only the queued jobs in the database for additional info
+        # (rows are (job_id, original_filename, copies, duplex) tuples;
+        # later submissions win if a job ID was reused)
+        job_ids = [cups_job['job_id'] for cups_job in cups_queue]
+        db_jobs = {job[0]: job for job in get_jobs_by_ids(job_ids)}
 
         # Merge information
         queue = []
         for cups_job in cups_queue:
             job_id = cups_job['job_id']
-            db_job = db_jobs.get(job_id, {})
+            db_job = db_jobs.get(job_id)
 
             queue.append({
                 'job_id': job_id,
-                'filename': db_job.get('original_filename', 'Unknown'),
-                'copies': db_job.get('copies', 1),
-                'duplex': db_job.get('duplex', False),
+                'filename': db_job[1] if db_job else 'Unknown',
+                'copies': db_job[2] if db_job else 1,
+                'duplex': bool(db_job[3]) if db_job else False,
                 'status': cups_job['status'],
                 'size': cups_job.get('size', 'Unknown')
             })
 
-        return jsonify({
+        return _json({
             'success': True,
             'queue': queue
         })
 
     except Exception as e:
-        return jsonify({
+        return _json({
             'success': False,
             'error': f'Error getting queue: {str(e)}'
-        }), 500
+        }, 500)
 
 
 @app.route('/api/history', methods=['GET'])
 def get_history():
     """Get print history for the last 7 days."""
     try:
-        jobs = get_recent_jobs(app.config['FILE_RETENTION_DAYS'])
-
-        # Format jobs for response
-        history = []
-        for job in jobs:
-            history.append({
-                'job_id': job['job_id'],
-                'filename': job['original_filename'],
-                'copies': job['copies'],
-                'duplex': bool(job['duplex']),
-                'status': job['status'],
-                'submitted_at': job['submitted_at'],
-                'completed_at': job.get('completed_at'),
-                'file_size_mb': round(job['file_size_mb'], 2),
-                'error_message': job.get('error_message')
-            })
+        jobs = get_recent_jobs(RETENTION_DAYS)
+
+        # Format jobs for response (rows are tuples in HISTORY_COLUMNS order)
+        history = [
+            {
+                'job_id': job[0],
+                'filename': job[1],
+                'copies': job[2],
+                'duplex': bool(job[3]),
+                'status': job[4],
+                'submitted_at': job[5],
+                'completed_at': job[6],
+                'file_size_mb': round(job[7], 2),
+                'error_message': job[8]
+            }
+            for job in jobs
+        ]
 
-        return jsonify({
+        return _json({
             'success': True,
             'history': history
         })
 
     except Exception as e:
-        return jsonify({
+        return _json({
             'success': False,
             'error': f'Error getting history: {str(e)}'
-        }), 500
+        }, 500)
 
 
 @app.route('/api/cancel/<job_id>', methods=['POST'])
@@ -359,23 +412,23 @@ def get_status():
     """Get system status."""
     try:
         cups_available = check_cups_available()
-        upload_folder_ok = ensure_upload_folder_exists(app.config['UPLOAD_FOLDER'])
+        upload_folder_ok = ensure_upload_folder_exists(UPLOAD_FOLDER)
 
-        return jsonify({
+        return _json({
             'success': True,
             'status': {
                 'cups_available': cups_available,
                 'upload_folder_ok': upload_folder_ok,
-                'hostname': app.config['HOSTNAME'],
-                'app_name': app.config['APP_NAME']
+                'hostname': HOSTNAME,
+                'app_name': APP_NAME
             }
         })
 
     except Exception as e:
-        return jsonify({
+        return _json({
             'success': False,
             'error': f'Error getting status: {str(e)}'
-        }), 500
+        }, 500)
 
 
 @app.errorhandler(413)
@@ -383,14 +436,18 @@ def request_entity_too_large(error):
     """Handle file too large error."""
     return jsonify({
         'success': False,
-        'error': f'File too large. Maximum size is {app.config["MAX_CONTENT_LENGTH"] / (1024*1024):.0f} MB'
+        'error': f'File too large. Maximum size is {MAX_UPLOAD_MB:.0f} MB'
     }), 413
 
 
 if __name__ == '__main__':
-    # Run on all interfaces to be accessible via hostname
-    app.run(
+    from waitress import serve
+
+    # Run on all interfaces to be accessible via hostname; waitress handles
+    # requests on a thread pool so queue polling doesn't block uploads
+    serve(
+        app,
         host='0.0.0.0',
         port=5000,
-        debug=True
+        threads=8
     )
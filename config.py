@@ -12,7 +12,7 @@ class Config:
     # File upload settings
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'print')
     MAX_CONTENT_LENGTH = 20 * 1024 * 1024  # 20 MB limit
-    ALLOWED_EXTENSIONS = {'pdf', 'txt', 'jpg', 'jpeg', 'png'}
+    ALLOWED_EXTENSIONS = frozenset({'pdf', 'txt', 'jpg', 'jpeg', 'png'})
 
     # Print settings
     FILE_RETENTION_DAYS = 7
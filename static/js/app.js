@@ -175,6 +175,10 @@ async function handleFormSubmit(e) {
                 }
             });
 
+            if (data.warning) {
+                showToast(data.warning, 'info');
+            }
+
             // Clear form
             selectedFiles = [];
             renderSelectedFiles();
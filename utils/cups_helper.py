@@ -1,9 +1,51 @@
 import subprocess
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import List, Dict, Optional, Tuple
 
 
+# lpstat -o line: "printer-123 user 1024 Mon Nov 12 10:30:00 2025"
+# Fields are separated by spaces/tabs only, so a match never spans lines.
+# Lines need at least 5 fields; the "-123" job number suffix is optional.
+_LPSTAT_RE = re.compile(
+    r'^(\S+?(?:-(\d+))?)[^\S\n]+(\S+)[^\S\n]+(\S+)(?=[^\S\n]+\S+[^\S\n]+\S)', re.M
+)
+
+# lp output: "request id is printer-123 (1 file(s))"
+_JOBID_RE = re.compile(r'request id is \S+-(\d+)')
+
+# Extra subprocess.run arguments for every CUPS command. close_fds=False
+# skips the close loop per fork; it is safe only while every descriptor in
+# the process is close-on-exec: Python's own (sockets, files) are
+# non-inheritable per PEP 446, and SQLite's unix VFS opens the database and
+# WAL files with O_CLOEXEC itself. Revisit this before adding C extensions
+# or os.set_inheritable() calls that could leave inheritable descriptors.
+_RUN_KWARGS = dict(stdin=subprocess.DEVNULL, close_fds=False)
+
+# Maximum number of lp commands run at once for a bulk submission
+# (set to 1 to keep print order identical to upload order)
+MAX_SUBMIT_WORKERS = 4
+
+# How long (seconds) cached CUPS results stay valid
+CUPS_STATUS_TTL = 5.0
+PRINT_QUEUE_TTL = 1.0
+
+# Cached lpstat results, shared across request threads
+_cups_cache = {'ts': float('-inf'), 'ok': False}
+_cups_lock = threading.Lock()
+_queue_cache = {'ts': float('-inf'), 'jobs': []}
+_queue_lock = threading.Lock()
+
+
+def _invalidate_queue_cache():
+    """Force the next get_print_queue call to query CUPS."""
+    with _queue_lock:
+        _queue_cache['ts'] = float('-inf')
+
+
 def submit_print_job(filepath: str, copies: int = 1, duplex: bool = False) -> Tuple[bool, str]:
     """
     Submit a print job to CUPS using the lp command.
@@ -40,12 +82,15 @@ def submit_print_job(filepath: str, copies: int = 1, duplex: bool = False) -> Tu
             cmd,
             capture_output=True,
             text=True,
-            timeout=10
+            timeout=10,
+            **_RUN_KWARGS
         )
 
         if result.returncode == 0:
+            _invalidate_queue_cache()
+
             # Parse job ID from output (format: "request id is printer-123 (1 file(s))")
-            match = re.search(r'request id is \S+-(\d+)', result.stdout)
+            match = _JOBID_RE.search(result.stdout)
             if match:
                 job_id = match.group(1)
                 return True, job_id
@@ -62,6 +107,40 @@ def submit_print_job(filepath: str, copies: int = 1, duplex: bool = False) -> Tu
         return False, f'Error submitting print job: {str(e)}'
 
 
+def submit_print_jobs_bulk(
+    filepaths: List[str], copies: int = 1, duplex: bool = False
+) -> List[Tuple[str, bool, str]]:
+    """
+    Submit several files to CUPS with the same print options.
+
+    Each file is sent as its own lp request: a single lp call with several
+    files creates one CUPS job, which would leave the files sharing a job
+    ID for cancel, reprint and history. The requests run concurrently on
+    up to MAX_SUBMIT_WORKERS threads, so CUPS assigns job IDs in whatever
+    order the lp processes reach the scheduler: the queue and print order
+    of a multi-file upload is not guaranteed to match the input order.
+
+    Args:
+        filepaths: Full paths to the files to print
+        copies: Number of copies to print (1-10)
+        duplex: Whether to enable duplex (double-sided) printing
+
+    Returns:
+        List of (filepath, success, message) tuples in input order
+        (only this list is ordered, not the jobs in the CUPS queue).
+        On success, message contains the job ID; otherwise the error description
+    """
+    def submit(filepath: str) -> Tuple[str, bool, str]:
+        success, message = submit_print_job(filepath, copies, duplex)
+        return filepath, success, message
+
+    if len(filepaths) <= 1:
+        return [submit(filepath) for filepath in filepaths]
+
+    with ThreadPoolExecutor(max_workers=min(MAX_SUBMIT_WORKERS, len(filepaths))) as executor:
+        return list(executor.map(submit, filepaths))
+
+
 def get_print_queue() -> List[Dict[str, str]]:
     """
     Get the current print queue status from CUPS.
@@ -73,34 +152,43 @@ def get_print_queue() -> List[Dict[str, str]]:
         - filename: Name of the file
         - size: File size
         - status: Job status (pending, processing, etc.)
+
+    Results are cached for PRINT_QUEUE_TTL seconds.
     """
+    with _queue_lock:
+        if time.monotonic() - _queue_cache['ts'] < PRINT_QUEUE_TTL:
+            return list(_queue_cache['jobs'])
+
+        jobs = _fetch_print_queue()
+        _queue_cache['ts'] = time.monotonic()
+        _queue_cache['jobs'] = jobs
+        return list(jobs)
+
+
+def _fetch_print_queue() -> List[Dict[str, str]]:
+    """Query lpstat for the current print queue."""
     try:
         # Use lpstat -o to get current jobs
         result = subprocess.run(
             ['/usr/bin/lpstat', '-o'],
             capture_output=True,
             text=True,
-            timeout=5
+            timeout=5,
+            **_RUN_KWARGS
         )
 
         jobs = []
-        if result.returncode == 0 and result.stdout.strip():
-            # Parse lpstat output
-            # Format: printer-123 user 1024 Mon Nov 12 10:30:00 2025
-            for line in result.stdout.strip().split('\n'):
-                parts = line.split()
-                if len(parts) >= 5:
-                    # Extract job ID from printer-123 format
-                    job_match = re.search(r'-(\d+)$', parts[0])
-                    job_id = job_match.group(1) if job_match else parts[0]
-
-                    jobs.append({
-                        'job_id': job_id,
-                        'user': parts[1],
-                        'size': parts[2],
-                        'status': 'pending',
-                        'full_id': parts[0]
-                    })
+        if result.returncode == 0:
+            # Parse lpstat output, one job per line
+            for match in _LPSTAT_RE.finditer(result.stdout):
+                jobs.append({
+                    # Fall back to the full ID if it has no job number suffix
+                    'job_id': match.group(2) or match.group(1),
+                    'user': match.group(3),
+                    'size': match.group(4),
+                    'status': 'pending',
+                    'full_id': match.group(1)
+                })
 
         return jobs
 
@@ -134,7 +222,8 @@ def get_job_status(job_id: str) -> Optional[str]:
             ['/usr/bin/lpstat', '-W', 'completed', '-o'],
             capture_output=True,
             text=True,
-            timeout=5
+            timeout=5,
+            **_RUN_KWARGS
         )
 
         if result.returncode == 0:
@@ -165,10 +254,12 @@ def cancel_print_job(job_id: str) -> Tuple[bool, str]:
             ['/usr/bin/cancel', job_id],
             capture_output=True,
             text=True,
-            timeout=5
+            timeout=5,
+            **_RUN_KWARGS
         )
 
         if result.returncode == 0:
+            _invalidate_queue_cache()
             return True, f'Job {job_id} cancelled successfully'
         else:
             return False, result.stderr.strip() or 'Failed to cancel job'
@@ -185,15 +276,30 @@ def check_cups_available() -> bool:
     """
     Check if CUPS is available and responsive.
 
+    The result is cached for CUPS_STATUS_TTL seconds.
+
     Returns:
         True if CUPS is available, False otherwise
     """
+    with _cups_lock:
+        if time.monotonic() - _cups_cache['ts'] < CUPS_STATUS_TTL:
+            return _cups_cache['ok']
+
+        ok = _probe_cups()
+        _cups_cache['ts'] = time.monotonic()
+        _cups_cache['ok'] = ok
+        return ok
+
+
+def _probe_cups() -> bool:
+    """Run lpstat -r to check whether the CUPS scheduler is running."""
     try:
         result = subprocess.run(
             ['/usr/bin/lpstat', '-r'],
             capture_output=True,
             text=True,
-            timeout=5
+            timeout=5,
+            **_RUN_KWARGS
         )
         return result.returncode == 0
     except Exception:
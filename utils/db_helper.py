@@ -1,33 +1,83 @@
 import sqlite3
 import os
+import queue
+import time
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from contextlib import contextmanager
 
 # IST timezone (UTC+5:30)
 IST = timezone(timedelta(hours=5, minutes=30))
+IST_OFFSET_SECONDS = int(IST.utcoffset(None).total_seconds())
 
 
 DATABASE_FILE = 'print_history.db'
 
+# Columns returned by get_recent_jobs, in tuple order
+HISTORY_COLUMNS = (
+    'job_id', 'original_filename', 'copies', 'duplex', 'status',
+    'submitted_at', 'completed_at', 'file_size_mb', 'error_message'
+)
+
+# Columns returned as job dictionaries
+JOB_COLUMNS = (
+    'job_id', 'filename', 'original_filename', 'filepath', 'file_size_mb',
+    'copies', 'duplex', 'status', 'submitted_at', 'completed_at', 'error_message'
+)
+
+# Number of connections kept open in the pool
+POOL_SIZE = 4
+
+
+def _create_connection() -> sqlite3.Connection:
+    """Open and configure a connection for the pool."""
+    # Autocommit mode; transactions are managed explicitly in get_db_connection
+    conn = sqlite3.connect(DATABASE_FILE, check_same_thread=False, isolation_level=None)
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    conn.execute('PRAGMA cache_size=-8000')
+    conn.execute('PRAGMA mmap_size=67108864')
+    conn.execute('PRAGMA wal_autocheckpoint=1000')
+    return conn
+
+
+# Pool of open connections shared across request threads
+_pool = queue.Queue(maxsize=POOL_SIZE)
+for _ in range(POOL_SIZE):
+    _pool.put(_create_connection())
+
 
 @contextmanager
 def get_db_connection():
-    """Context manager for database connections."""
-    conn = sqlite3.connect(DATABASE_FILE)
-    conn.row_factory = sqlite3.Row
+    """Context manager that borrows a pooled connection for one transaction."""
+    conn = _pool.get()
     try:
+        conn.execute('BEGIN')
         yield conn
-        conn.commit()
-    except Exception:
-        conn.rollback()
-        raise
+        conn.execute('COMMIT')
     finally:
-        conn.close()
+        # Never hand back a connection with an open transaction, whatever
+        # ended the block (including GeneratorExit or KeyboardInterrupt)
+        try:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+        except sqlite3.Error:
+            conn.close()
+            conn = _create_connection()
+        _pool.put(conn)
 
 
 def init_database():
     """Initialize the database with required tables."""
+    # Persistent settings; these cannot be changed inside a transaction.
+    # page_size only takes effect before the first table is created.
+    conn = _pool.get()
+    try:
+        conn.execute('PRAGMA page_size=4096')
+        conn.execute('PRAGMA journal_mode=WAL')
+    finally:
+        _pool.put(conn)
+
     with get_db_connection() as conn:
         conn.execute('''
             CREATE TABLE IF NOT EXISTS print_jobs (
@@ -56,6 +106,11 @@ def init_database():
             CREATE INDEX IF NOT EXISTS idx_submitted_at ON print_jobs(submitted_at)
         ''')
 
+        # Create composite index for status-filtered, date-ordered queries
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_status_submitted ON print_jobs(status, submitted_at DESC)
+        ''')
+
 
 def add_print_job(
     job_id: str,
@@ -91,6 +146,30 @@ def add_print_job(
         return cursor.lastrowid
 
 
+def add_print_jobs_bulk(jobs: List[Tuple]) -> int:
+    """
+    Add several print jobs to the database in a single transaction.
+
+    Args:
+        jobs: List of (job_id, filename, original_filename, filepath,
+              file_size_mb, copies, duplex) tuples
+
+    Returns:
+        Number of records inserted
+    """
+    if not jobs:
+        return 0
+
+    with get_db_connection() as conn:
+        current_time = datetime.now(IST).strftime('%Y-%m-%d %H:%M:%S')
+        cursor = conn.executemany('''
+            INSERT INTO print_jobs
+            (job_id, filename, original_filename, filepath, file_size_mb, copies, duplex, status, submitted_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 'pending', ?)
+        ''', [job + (current_time,) for job in jobs])
+        return cursor.rowcount
+
+
 def update_job_status(job_id: str, status: str, error_message: Optional[str] = None):
     """
     Update the status of a print job.
@@ -116,7 +195,13 @@ def update_job_status(job_id: str, status: str, error_message: Optional[str] = N
             ''', (status, error_message, job_id))
 
 
-def get_recent_jobs(days: int = 7) -> List[Dict]:
+def _cutoff_timestamp(days: int) -> str:
+    """Format the IST time N days ago the way submitted_at is stored."""
+    cutoff_ts = time.time() - days * 86400
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(cutoff_ts + IST_OFFSET_SECONDS))
+
+
+def get_recent_jobs(days: int = 7) -> List[Tuple]:
     """
     Get print jobs from the last N days.
 
@@ -124,17 +209,17 @@ def get_recent_jobs(days: int = 7) -> List[Dict]:
         days: Number of days to look back
 
     Returns:
-        List of job dictionaries
+        List of job tuples with fields in HISTORY_COLUMNS order
     """
+    cutoff_date = _cutoff_timestamp(days)
     with get_db_connection() as conn:
-        cutoff_date = (datetime.now(IST) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
-        cursor = conn.execute('''
-            SELECT * FROM print_jobs
+        cursor = conn.execute(f'''
+            SELECT {', '.join(HISTORY_COLUMNS)} FROM print_jobs
             WHERE submitted_at > ?
             ORDER BY submitted_at DESC
         ''', (cutoff_date,))
 
-        return [dict(row) for row in cursor.fetchall()]
+        return cursor.fetchall()
 
 
 def get_job_by_id(job_id: str) -> Optional[Dict]:
@@ -148,13 +233,38 @@ def get_job_by_id(job_id: str) -> Optional[Dict]:
         Job dictionary or None if not found
     """
     with get_db_connection() as conn:
-        cursor = conn.execute('''
-            SELECT * FROM print_jobs
+        cursor = conn.execute(f'''
+            SELECT {', '.join(JOB_COLUMNS)} FROM print_jobs
             WHERE job_id = ?
         ''', (job_id,))
 
         row = cursor.fetchone()
-        return dict(row) if row else None
+        return dict(zip(JOB_COLUMNS, row)) if row else None
+
+
+def get_jobs_by_ids(job_ids: List[str]) -> List[Tuple]:
+    """
+    Get print jobs matching any of the given CUPS job IDs.
+
+    Args:
+        job_ids: CUPS job IDs to look up
+
+    Returns:
+        List of (job_id, original_filename, copies, duplex) tuples,
+        oldest first
+    """
+    if not job_ids:
+        return []
+
+    with get_db_connection() as conn:
+        placeholders = ', '.join('?' * len(job_ids))
+        cursor = conn.execute(f'''
+            SELECT job_id, original_filename, copies, duplex FROM print_jobs
+            WHERE job_id IN ({placeholders})
+            ORDER BY submitted_at ASC
+        ''', job_ids)
+
+        return cursor.fetchall()
 
 
 def delete_old_records(days: int = 7) -> int:
@@ -167,8 +277,8 @@ def delete_old_records(days: int = 7) -> int:
     Returns:
         Number of records deleted
     """
+    cutoff_date = _cutoff_timestamp(days)
     with get_db_connection() as conn:
-        cutoff_date = (datetime.now(IST) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
         cursor = conn.execute('''
             DELETE FROM print_jobs
             WHERE submitted_at < ?
@@ -185,10 +295,10 @@ def get_pending_jobs() -> List[Dict]:
         List of pending job dictionaries
     """
     with get_db_connection() as conn:
-        cursor = conn.execute('''
-            SELECT * FROM print_jobs
+        cursor = conn.execute(f'''
+            SELECT {', '.join(JOB_COLUMNS)} FROM print_jobs
             WHERE status = 'pending'
             ORDER BY submitted_at ASC
         ''')
 
-        return [dict(row) for row in cursor.fetchall()]
+        return [dict(zip(JOB_COLUMNS, row)) for row in cursor.fetchall()]
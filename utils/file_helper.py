@@ -1,53 +1,58 @@
 import os
+import shutil
+import time
+from contextlib import suppress
 import magic
-from datetime import datetime, timedelta
+from datetime import datetime
 from werkzeug.utils import secure_filename
-from config import Config
 
 
-def allowed_file(filename: str) -> bool:
+# Shared libmagic handle; loading the magic database is expensive
+_MIME = magic.Magic(mime=True)
+
+# Number of leading bytes inspected when sniffing an upload's MIME type
+MIME_SNIFF_BYTES = 4096
+
+# Buffer size used when writing uploads to disk
+SAVE_CHUNK_BYTES = 1 << 20  # 1 MB
+
+# Map extensions to the MIME types their content may have
+_MIME_BY_EXT = {
+    'pdf': frozenset({'application/pdf'}),
+    'txt': frozenset({'text/plain', 'text/x-shellscript'}),
+    'jpg': frozenset({'image/jpeg'}),
+    'jpeg': frozenset({'image/jpeg'}),
+    'png': frozenset({'image/png'}),
+}
+
+
+def get_file_extension(filename: str) -> str:
     """
-    Check if a file has an allowed extension.
+    Get a file's extension in lowercase.
 
     Args:
-        filename: The filename to check
+        filename: The filename to inspect
 
     Returns:
-        True if the file extension is allowed, False otherwise
+        The extension without the dot, or an empty string if there is none
     """
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in Config.ALLOWED_EXTENSIONS
+    return os.path.splitext(filename)[1][1:].lower()
 
 
-def validate_file_content(filepath: str, expected_extension: str) -> bool:
+def validate_file_header(header_bytes: bytes, expected_extension: str) -> bool:
     """
-    Validate that a file's content matches its extension using python-magic.
+    Validate that a file's leading bytes match its extension using python-magic.
 
     Args:
-        filepath: Path to the file to validate
+        header_bytes: The first MIME_SNIFF_BYTES bytes of the file
         expected_extension: The expected file extension (without dot)
 
     Returns:
         True if file content matches extension, False otherwise
     """
     try:
-        mime = magic.Magic(mime=True)
-        file_mime = mime.from_file(filepath)
-
-        # Map extensions to expected MIME types
-        mime_map = {
-            'pdf': 'application/pdf',
-            'txt': 'text/plain',
-            'jpg': 'image/jpeg',
-            'jpeg': 'image/jpeg',
-            'png': 'image/png'
-        }
-
-        expected_mime = mime_map.get(expected_extension.lower())
-        if not expected_mime:
-            return False
-
-        return file_mime == expected_mime
+        expected = _MIME_BY_EXT.get(expected_extension.lower())
+        return expected is not None and _MIME.from_buffer(header_bytes) in expected
 
     except Exception:
         # If validation fails, err on the side of caution
@@ -74,6 +79,55 @@ def get_safe_filename(filename: str) -> str:
     return f"{timestamp}_{name}{ext}"
 
 
+def save_upload(file, upload_folder: str, filename: str) -> str:
+    """
+    Write an uploaded file to disk in large blocks.
+
+    The file is created exclusively, so an existing file is never
+    overwritten; if the name is taken a numeric suffix is added.
+
+    Args:
+        file: The werkzeug FileStorage to save
+        upload_folder: Folder to save the file in
+        filename: Preferred filename
+
+    Returns:
+        Full path of the saved file
+    """
+    name, ext = os.path.splitext(filename)
+    filepath = os.path.join(upload_folder, filename)
+    suffix = 0
+
+    while True:
+        try:
+            out = open(filepath, 'xb')
+            break
+        except FileExistsError:
+            suffix += 1
+            filepath = os.path.join(upload_folder, f"{name}_{suffix}{ext}")
+
+    try:
+        with out:
+            shutil.copyfileobj(file.stream, out, SAVE_CHUNK_BYTES)
+    except Exception:
+        # Don't leave a partial file behind
+        safe_unlink(filepath)
+        raise
+
+    return filepath
+
+
+def safe_unlink(filepath: str):
+    """
+    Remove a file, ignoring it if it doesn't exist.
+
+    Args:
+        filepath: Path to the file to remove
+    """
+    with suppress(FileNotFoundError):
+        os.unlink(filepath)
+
+
 def cleanup_old_files(upload_folder: str, retention_days: int) -> int:
     """
     Remove files older than the retention period.
@@ -88,27 +142,24 @@ def cleanup_old_files(upload_folder: str, retention_days: int) -> int:
     if not os.path.exists(upload_folder):
         return 0
 
-    cutoff_time = datetime.now() - timedelta(days=retention_days)
+    cutoff_ts = time.time() - retention_days * 86400
     deleted_count = 0
 
     try:
-        for filename in os.listdir(upload_folder):
-            filepath = os.path.join(upload_folder, filename)
-
-            # Skip if not a file
-            if not os.path.isfile(filepath):
-                continue
-
-            # Check file modification time
-            file_mtime = datetime.fromtimestamp(os.path.getmtime(filepath))
-
-            if file_mtime < cutoff_time:
-                try:
-                    os.remove(filepath)
-                    deleted_count += 1
-                except Exception:
-                    # Continue even if we can't delete a file
-                    pass
+        with os.scandir(upload_folder) as entries:
+            for entry in entries:
+                # Skip if not a file
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+
+                # Check file modification time
+                if entry.stat(follow_symlinks=False).st_mtime < cutoff_ts:
+                    try:
+                        os.unlink(entry.path)
+                        deleted_count += 1
+                    except Exception:
+                        # Continue even if we can't delete a file
+                        pass
 
     except Exception:
         pass